@@ -1,10 +1,28 @@
-from flask import Flask, jsonify, request
+# Make blocking I/O cooperative before anything opens a socket
+from gevent import monkey
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg
+patch_psycopg()
+
+from gevent.lock import BoundedSemaphore
+
+from flask import Flask, Response, request
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
+import orjson
+import fastjsonschema
+from fastjsonschema import JsonSchemaValueException
 import psycopg2
 import os
 import re
-from datetime import datetime, timezone
-from psycopg2.extras import RealDictCursor
+import hashlib
+import itertools
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from psycopg2.extensions import connection as PGConnection
+from psycopg2.extras import execute_values
 from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 from urllib.parse import urlparse
@@ -12,154 +30,418 @@ from urllib.parse import urlparse
 # Load environment variables
 load_dotenv()
 
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson's C encoder/decoder."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NAIVE_UTC).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)  # Consider adding origin restrictions in production
 
+# Compress JSON responses, preferring Brotli when the client accepts it
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 1024
+Compress(app)
+
+# Named statements cannot outlive a transaction behind a transaction-pooling
+# PgBouncer, so deployments using one set PG_PREPARE_STATEMENTS=0
+PREPARE_STATEMENTS = os.environ.get('PG_PREPARE_STATEMENTS', '1') == '1'
+
+# Hot-path queries, prepared once per pooled connection: name -> (param types, SQL)
+STATEMENTS = {
+    # Postgres builds the whole JSON page, so rows never become Python objects
+    'get_tasks': ('int, bigint, int', """
+        SELECT json_build_object(
+            'tasks', COALESCE(json_agg(json_build_object(
+                'id', id,
+                'name', name,
+                'progress', progress,
+                'assigned_to', assigned_to,
+                'deadline', to_char(deadline, 'YYYY-MM-DD'),
+                'priority', priority
+            ) ORDER BY id), '[]'::json),
+            'next_cursor', CASE WHEN count(*) = %s THEN max(id) END
+        )::text
+        FROM (
+            SELECT id, name, progress, assigned_to, deadline, priority
+            FROM tasks
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+        ) AS page
+    """),
+    'add_task': ('text, int, text, date, text', """
+        INSERT INTO tasks (name, progress, assigned_to, deadline, priority)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING id
+    """),
+    'update_task': ('int, bigint', """
+        UPDATE tasks
+        SET progress = %s
+        WHERE id = %s
+        RETURNING id
+    """),
+    'delete_task': ('bigint', "DELETE FROM tasks WHERE id = %s RETURNING id"),
+}
+
+class PreparingConnection(PGConnection):
+    """Connection that remembers whether STATEMENTS have been prepared on it."""
+    prepared = False
+
+def prepare_statements(conn):
+    with conn.cursor() as cursor:
+        # Clear anything left by an earlier, partially failed attempt
+        cursor.execute("DEALLOCATE ALL")
+        for name, (types, sql) in STATEMENTS.items():
+            n = itertools.count(1)
+            positional = re.sub(r'%s', lambda _: f'${next(n)}', sql)
+            cursor.execute(f"PREPARE {name} ({types}) AS {positional}")
+    conn.commit()
+    conn.prepared = True
+
+def execute_statement(cursor, name, params):
+    if not cursor.connection.prepared:
+        cursor.execute(STATEMENTS[name][1], params)
+        return
+    placeholders = ', '.join(['%s'] * len(params))
+    cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+
 # Database connection pooling
 db_url = urlparse(os.environ['DATABASE_URL'])
+# minconn connections are opened per worker at boot; keep it small so that
+# workers x minconn stays well under the server's max_connections
 pool = ThreadedConnectionPool(
-    minconn=1,
-    maxconn=20,
+    minconn=int(os.environ.get('PG_POOL_MIN', '5')),
+    maxconn=int(os.environ.get('PG_POOL_MAX', '20')),
     user=db_url.username,
     password=db_url.password,
     host=db_url.hostname,
     port=db_url.port,
-    database=db_url.path[1:]
+    database=db_url.path[1:],
+    connection_factory=PreparingConnection
 )
 
+# getconn raises PoolError instead of waiting once maxconn connections are
+# out, so greenlets queue here for a free slot first
+pool_slots = BoundedSemaphore(pool.maxconn)
+
+# Connections currently checked out of the pool
+pool_in_use = 0
+
 def get_db_connection():
-    return pool.getconn()
+    global pool_in_use
+    pool_slots.acquire()
+    try:
+        conn = pool.getconn()
+    except Exception:
+        pool_slots.release()
+        raise
+    pool_in_use += 1
+    # putconn closes connections beyond minconn, so only prepare while no more
+    # than minconn are out; the rest run the plain SQL
+    if PREPARE_STATEMENTS and not conn.prepared and pool_in_use <= pool.minconn:
+        try:
+            prepare_statements(conn)
+        except psycopg2.Error as e:
+            # e.g. the tasks table does not exist yet; retried on next checkout
+            app.logger.warning(f"Could not prepare statements: {str(e)}")
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                release_db_connection(conn)
+                raise
+    return conn
 
 def release_db_connection(conn):
-    pool.putconn(conn)
+    global pool_in_use
+    pool_in_use -= 1
+    try:
+        pool.putconn(conn)
+    finally:
+        pool_slots.release()
+
+def warm_pool():
+    # The pool opens minconn connections up front; check them all out at
+    # once so they are prepared before the first request instead of during it
+    conns = [get_db_connection() for _ in range(pool.minconn)]
+    for conn in conns:
+        release_db_connection(conn)
+
+warm_pool()
+
+# Ids are bigint; larger values cannot match a row
+BIGINT_MAX = 2**63 - 1
+
+# Keyset pagination for GET /tasks
+TASKS_PAGE_SIZE = 50
+TASKS_PAGE_MAX = 200
+
+def ojson(obj, status=200):
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+def compressed_etag(body, etag):
+    # The ETag Flask-Compress will send for this request: it appends
+    # ":<algorithm>" when it compresses, picking the highest client quality
+    # and breaking ties by COMPRESS_ALGORITHM order
+    if len(body) < app.config['COMPRESS_MIN_SIZE']:
+        return etag
+    best, best_quality = None, 0
+    for algorithm in app.config['COMPRESS_ALGORITHM']:
+        quality = request.accept_encodings[algorithm]
+        if quality > best_quality:
+            best, best_quality = algorithm, quality
+    # An explicitly preferred identity encoding means no compression
+    if best is None or best_quality < request.accept_encodings['identity']:
+        return etag
+    return f'{etag}:{best}'
+
+def tasks_response(body, etag):
+    # Flask-Compress does not evaluate If-None-Match itself, so compare
+    # against the tag it would send for this request's encoding
+    sent_etag = compressed_etag(body, etag)
+    if request.if_none_match.star_tag or sent_etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(sent_etag)
+        response.vary.add('Accept-Encoding')
+    else:
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+    # Always revalidate: a write on any worker must be visible on the next read
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 # Validation functions
+_validate_task = fastjsonschema.compile({
+    "type": "object",
+    "required": ["name", "priority"],
+    "properties": {
+        "name": {"type": "string", "pattern": r"^[\w\s\-()]{3,100}$"},
+        "priority": {"enum": ["Low", "Medium", "High"]},
+        "progress": {"type": "integer", "minimum": 0, "maximum": 100},
+        "assigned_to": {"type": ["string", "null"]},
+        # Empty means "no deadline"; the calendar and past checks happen below
+        "deadline": {"type": ["string", "null"], "pattern": r"^(\d{4}-\d{2}-\d{2})?$"},
+    },
+})
+
+# User-facing messages per schema field; the dashboard shows these verbatim
+_TASK_FIELD_ERRORS = {
+    'name': "Invalid task name (3-100 alphanumeric characters)",
+    'priority': "Invalid priority value",
+    'progress': "Progress must be between 0-100",
+    'assigned_to': "Invalid assignee",
+    'deadline': "Invalid deadline format. Use YYYY-MM-DD.",
+}
+
+def schema_error_message(e, data):
+    if e.rule == 'required':
+        field = next(f for f in ('name', 'priority') if f not in data)
+    else:
+        field = e.name.partition('.')[2]
+    return _TASK_FIELD_ERRORS.get(field, "Invalid task data")
+
 def validate_task_data(data):
-    # Name validation
-    if not re.match(r'^[\w\s\-()]{3,100}$', data.get('name', '')):
-        return {"error": "Invalid task name (3-100 alphanumeric characters)"}, 400
-    
-    # Priority validation
-    if data.get('priority') not in ['Low', 'Medium', 'High']:
-        return {"error": "Invalid priority value"}, 400
-    
-    # Deadline validation with timezone awareness
-    if 'deadline' in data and data['deadline']:
+    try:
+        _validate_task(data)
+    except JsonSchemaValueException as e:
+        return {"error": schema_error_message(e, data)}, 400
+
+    # Deadline validation against today's UTC date
+    if data.get('deadline'):
         try:
-            deadline_dt = datetime.strptime(data['deadline'], '%Y-%m-%d').replace(tzinfo=timezone.utc)
-            if deadline_dt < datetime.now(timezone.utc):
-                return {"error": "Deadline cannot be in the past"}, 400
+            deadline = date.fromisoformat(data['deadline'])
         except ValueError:
             return {"error": "Invalid deadline format. Use YYYY-MM-DD."}, 400
-    
+        if deadline < datetime.now(timezone.utc).date():
+            return {"error": "Deadline cannot be in the past"}, 400
+
+
+# Bodies above this size skip the cache so clients cannot pin large payloads
+VALIDATION_CACHE_MAX_BODY = 2048
+
+def _parse_and_validate(body, today):
+    # `today` is part of the cache key so results that depend on the date expire
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None, ({"error": "Invalid JSON body"}, 400)
+    return data, validate_task_data(data)
+
+_cached_validate = lru_cache(maxsize=1024)(_parse_and_validate)
 
 # Routes
 @app.route('/tasks', methods=['GET'])
 def get_tasks():
+    after = max(0, min(request.args.get('after', 0, type=int), BIGINT_MAX))
+    limit = max(1, min(request.args.get('limit', TASKS_PAGE_SIZE, type=int), TASKS_PAGE_MAX))
+
     conn = None
     try:
         conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute("""
-                SELECT id, name, progress, assigned_to, deadline, priority 
-                FROM tasks 
-                ORDER BY id
-            """)
-            tasks = cursor.fetchall()
-            for task in tasks:
-                if task['deadline']:
-                    task['deadline'] = task['deadline'].strftime('%Y-%m-%d')
-            return jsonify(tasks), 200
+        with conn.cursor() as cursor:
+            execute_statement(cursor, 'get_tasks', (limit, after, limit))
+            body = cursor.fetchone()[0].encode()
     except Exception as e:
         app.logger.error(f"Database error: {str(e)}")
-        return jsonify({"error": "Failed to retrieve tasks"}), 500
+        return ojson({"error": "Failed to retrieve tasks"}, 500)
     finally:
         if conn:
             release_db_connection(conn)
 
+    etag = hashlib.sha1(body).hexdigest()
+    return tasks_response(body, etag)
+
 @app.route('/tasks', methods=['POST'])
 def add_task():
-    data = request.json
-    validation = validate_task_data(data)
-    if validation: 
-        return validation
+    if not request.is_json:
+        return ojson({"error": "Content-Type must be application/json"}, 415)
+    body = request.get_data()
+    validate = _cached_validate if len(body) <= VALIDATION_CACHE_MAX_BODY else _parse_and_validate
+    data, validation = validate(body, datetime.now(timezone.utc).date())
+    if validation:
+        return ojson(*validation)
 
     conn = None
     try:
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO tasks (name, progress, assigned_to, deadline, priority)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
+            execute_statement(cursor, 'add_task', (
                 data['name'],
                 data.get('progress', 0),
                 data.get('assigned_to'),
-                data.get('deadline'),
+                data.get('deadline') or None,
                 data['priority']
             ))
             new_id = cursor.fetchone()[0]
             conn.commit()
-            return jsonify({"message": "Task added successfully", "id": new_id}), 201
+            return ojson({"message": "Task added successfully", "id": new_id}, 201)
     except Exception as e:
         app.logger.error(f"Database error: {str(e)}")
-        conn.rollback()
-        return jsonify({"error": "Failed to create task"}), 500
+        if conn:
+            conn.rollback()
+        return ojson({"error": "Failed to create task"}, 500)
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+@app.route('/tasks/bulk', methods=['POST'])
+def add_tasks_bulk():
+    data = request.json
+    if not isinstance(data, list) or not data:
+        return ojson({"error": "Expected a non-empty list of tasks"}, 400)
+    for index, task in enumerate(data):
+        validation = validate_task_data(task)
+        if validation:
+            error, status = validation
+            return ojson({**error, "index": index}, status)
+
+    rows = [(
+        task['name'],
+        task.get('progress', 0),
+        task.get('assigned_to'),
+        task.get('deadline') or None,
+        task['priority']
+    ) for task in data]
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            new_ids = execute_values(cursor, """
+                INSERT INTO tasks (name, progress, assigned_to, deadline, priority)
+                VALUES %s
+                RETURNING id
+            """, rows, template="(%s, %s, %s, %s, %s)", page_size=500, fetch=True)
+            conn.commit()
+            return ojson({
+                "message": "Tasks added successfully",
+                "ids": [row[0] for row in new_ids]
+            }, 201)
+    except Exception as e:
+        app.logger.error(f"Database error: {str(e)}")
+        if conn:
+            conn.rollback()
+        return ojson({"error": "Failed to create tasks"}, 500)
     finally:
         if conn:
             release_db_connection(conn)
 
 @app.route('/tasks/<int:task_id>', methods=['PUT'])
 def update_task(task_id):
+    if task_id > BIGINT_MAX:
+        return ojson({"error": "Task not found"}, 404)
     data = request.json
     if 'progress' in data and not (0 <= data['progress'] <= 100):
-        return jsonify({"error": "Progress must be between 0-100"}), 400
+        return ojson({"error": "Progress must be between 0-100"}, 400)
 
     conn = None
     try:
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("""
-                UPDATE tasks 
-                SET progress = %s 
-                WHERE id = %s
-            """, (data['progress'], task_id))
+            execute_statement(cursor, 'update_task', (data['progress'], task_id))
             
-            if cursor.rowcount == 0:
-                return jsonify({"error": "Task not found"}), 404
+            # Miss: return without committing; the pool rolls back on release
+            if cursor.fetchone() is None:
+                return ojson({"error": "Task not found"}, 404)
             
             conn.commit()
-            return jsonify({"message": "Task updated successfully"}), 200
+            return ojson({"message": "Task updated successfully"}, 200)
     except Exception as e:
         app.logger.error(f"Database error: {str(e)}")
-        conn.rollback()
-        return jsonify({"error": "Failed to update task"}), 500
+        if conn:
+            conn.rollback()
+        return ojson({"error": "Failed to update task"}, 500)
     finally:
         if conn:
             release_db_connection(conn)
 
 @app.route('/tasks/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
+    if task_id > BIGINT_MAX:
+        return ojson({"error": "Task not found"}, 404)
     conn = None
     try:
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("DELETE FROM tasks WHERE id = %s", (task_id,))
+            execute_statement(cursor, 'delete_task', (task_id,))
             
-            if cursor.rowcount == 0:
-                return jsonify({"error": "Task not found"}), 404
+            # Miss: return without committing; the pool rolls back on release
+            if cursor.fetchone() is None:
+                return ojson({"error": "Task not found"}, 404)
             
             conn.commit()
-            return jsonify({"message": "Task deleted successfully"}), 200
+            return ojson({"message": "Task deleted successfully"}, 200)
+    except Exception as e:
+        app.logger.error(f"Database error: {str(e)}")
+        if conn:
+            conn.rollback()
+        return ojson({"error": "Failed to delete task"}, 500)
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+@app.route('/health', methods=['GET'])
+def health():
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        return ojson({"status": "ok"}, 200)
     except Exception as e:
         app.logger.error(f"Database error: {str(e)}")
-        conn.rollback()
-        return jsonify({"error": "Failed to delete task"}), 500
+        return ojson({"status": "unavailable"}, 503)
     finally:
         if conn:
             release_db_connection(conn)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000)
+    from gevent.pywsgi import WSGIServer
+    WSGIServer(('0.0.0.0', 8000), app).serve_forever()
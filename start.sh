@@ -1,3 +1,7 @@
 #!/bin/sh
-gunicorn --bind 0.0.0.0:8000 app.main:app &
+gunicorn --bind 0.0.0.0:8000 \
+    --worker-class gevent \
+    --worker-connections 1000 \
+    --workers "${WEB_CONCURRENCY:-$(( $(nproc) * 2 + 1 ))}" \
+    app.main:app &
 exec caddy run --config /etc/caddy/Caddyfile